@@ -5,6 +5,7 @@ import datetime
 import threading
 import logging
 import socket
+import struct
 import queue
 import json
 import time
@@ -20,6 +21,18 @@ FORMAT = 'utf-8'
 HEADER_LENGTH = 8
 ID_LENGTH = 4
 
+# Precompiled codec for the [HEADER - 8 bytes][ID - 4 bytes] message prefix
+HEADER_STRUCT = struct.Struct('>QI')
+
+# Initial size of the receive buffer, grown if a message outsizes it
+RECV_BUFFER_SIZE = 65536
+
+# Upper bound on a single framed message; anything larger is a protocol violation
+MAX_MESSAGE_LENGTH = 16 * 1024 * 1024
+
+# sendmsg gathers the prefix and body into one kernel write without joining them first
+HAS_SENDMSG = hasattr(socket.socket, 'sendmsg')
+
 isbundled = getattr(sys, 'frozen', False) and hasattr(sys,'_MEIPASS')
 
 LOG_PATH = os.path.join(Path(__file__).parent.absolute() if not isbundled else os.path.dirname(sys.executable), "client.log")
@@ -42,6 +55,10 @@ log.setLevel(logging.DEBUG)
 log.addHandler(f_handler)
 # log.addHandler(c_handler)
 
+# Evaluated once at import so per-message paths can skip building f-string log
+# records entirely when info logging is turned off above
+LOG_INFO_ENABLED = log.isEnabledFor(logging.INFO)
+
 #-------------------- Threaded decorator --------------------#
 def threaded(func):
     def wrapper(*args, **kwargs):
@@ -67,9 +84,11 @@ class ClientProgram:
             indicates the status of the communication channel
         requestID (int):
             current requestID for this connection session
-        dataQueue (queue.Queue):
-            Queue for replies from the server
-        
+        replies (dict):
+            replies from the server keyed by request id, guarded by replyCondition
+        replyCondition (threading.Condition):
+            notified by the listener thread whenever a reply arrives
+
     '''
     class State(Enum):
         '''
@@ -99,6 +118,8 @@ class ClientProgram:
         self.connected = False
         self.requestID = 0
         self.replies= dict()
+        self.replyCondition = threading.Condition()
+        self.sendLock = threading.Lock()
 
         self.disconnectEvent = threading.Event()
         log.info("Client program initiated")
@@ -108,6 +129,7 @@ class ClientProgram:
         try:
             if not self.sock:
                 self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
             self.sock.connect((host, port))
             self.requestID = 0
             log.info(f"Connected to server at ({host}, {port})")
@@ -141,15 +163,9 @@ class ClientProgram:
             if req == 'DISCONNECT':
                 self.disconnectEvent.set()
 
-            data = None
-            
-            while True:
-                if self.disconnectEvent.is_set():
-                    break
-                if not self.dataQueue.empty():
-                    data = self.dataQueue.get()
-                    self.requestID += 1
-                    break
+            data = self.GetReplyFor(self.requestID, timeout=3)
+            if data is not None:
+                self.requestID += 1
 
             print(data)
             
@@ -171,16 +187,14 @@ class ClientProgram:
                 any message that came through
                 None is never returned if timeout is also None
         '''
-        totalTime = 0.0
-        while True:
-            if id not in self.replies:
-                time.sleep(0.1)
-                totalTime += 0.1
-                if timeout and totalTime > timeout:
+        endTime = time.monotonic() + timeout if timeout else None
+        with self.replyCondition:
+            while id not in self.replies:
+                remaining = endTime - time.monotonic() if endTime else None
+                if remaining is not None and remaining <= 0:
                     return None
-            else:
-                popped = self.replies.pop(id)
-                return popped
+                self.replyCondition.wait(remaining)
+            return self.replies.pop(id)
                 
     def Login(self, username:str, password:str):
         '''
@@ -301,55 +315,55 @@ class ClientProgram:
                 if False, an error has occured and the message is either not sent or sent errorneously
             requestID (int)
         '''
-        bytes_sent = 0
+        length = 0
         try:
-            length = len(message) + HEADER_LENGTH + ID_LENGTH
-            assert length <= 0xFFFFFFFFFFFFFFFF
-            header = length.to_bytes(HEADER_LENGTH, byteorder='big')
-            reqID = self.requestID.to_bytes(ID_LENGTH, byteorder='big')
-            message = b''.join([header, reqID, message])
-        
-            bytes_sent = self.sock.send(message)
-            assert bytes_sent == length, "Length of message sent does not match that of the actual message"
-
-            log.info(f"Sent message of length {length} to server.")
-            return True, self.requestID
-        except AssertionError as e:
-            log.info(f"Couldn't send full message of length {length} to server. Only {bytes_sent}")
+            length = len(message) + HEADER_STRUCT.size
+            # Serialize senders, window workers may issue requests concurrently
+            with self.sendLock:
+                reqID = self.requestID
+                prefix = HEADER_STRUCT.pack(length, reqID)
+                if HAS_SENDMSG:
+                    sent = self.sock.sendmsg([prefix, message])
+                    if sent < length:
+                        # The socket is blocking, sendall finishes the frame or raises
+                        self.sock.sendall(memoryview(prefix + message)[sent:])
+                else:
+                    self.sock.sendall(prefix + message)
+
+            if LOG_INFO_ENABLED:
+                log.info(f"Sent message of length {length} to server.")
+            return True, reqID
         except Exception as e:
             log.exception(f"Could not send message of length {length} to server.")
 
         return False, -1
-    
+
     @threaded
     def ListenForMessages(self):
         '''
         Threaded - Enable message listening mechanism
-        The method actively listens for requests
+        The method reads whatever bytes are available and reassembles complete messages
+        from a receive buffer, so the prefix and body usually arrive in a single recv
         The method terminates if:
             - The connection is lost
             - The server wants to disconnect, this will only happens once the client confirms with a specific message
             - the client wants to disconnect (via a message), this will happens once a specific message is received, regardless of unsent replies
         '''
-        while True:
-            message = None
+        rxBuffer = bytearray(RECV_BUFFER_SIZE)
+        rxView = memoryview(rxBuffer)
+        rxFilled = 0
+        disconnected = False
+        while not disconnected:
+            if rxFilled == len(rxBuffer):
+                # A message outsizes the buffer, double it so receiving can progress
+                rxView.release()
+                rxBuffer.extend(bytes(len(rxBuffer)))
+                rxView = memoryview(rxBuffer)
+
             try:
-                # Listens for HEADER message
-                header_of_message = self.sock.recv(HEADER_LENGTH, socket.MSG_PEEK)
-                if header_of_message:
-                    message_length = int.from_bytes(header_of_message, byteorder='big')
-                    if message_length:
-                        bytesReceived = 0
-                        chunks = []
-                        while bytesReceived < message_length:
-                            message = self.sock.recv(message_length - bytesReceived)
-                            bytesReceived += len(message)
-                            chunks.append(message)
-                        message = b''.join(chunks)
-                        # message is now b'<HEADER><ID><MESSAGE>'
-                        reqID = int.from_bytes(message[HEADER_LENGTH:HEADER_LENGTH + ID_LENGTH], byteorder='big')
-                        message = message[HEADER_LENGTH + ID_LENGTH:]
-                        log.info(f"Client has received message of length {message_length}")
+                received = self.sock.recv_into(rxView[rxFilled:])
+                if not received:
+                    raise ConnectionResetError("Connection closed by server")
             except ConnectionResetError as e:
                 self.disconnectEvent.set()
                 log.info(f"Abrupt disconnection occured while listening for messages. The connection will effectively close")
@@ -360,19 +374,49 @@ class ClientProgram:
                 log.exception(f"Exception occured on listening thread.")
                 break
 
-            # Now that we have a message
-            # If the message is "DISCONNECT"
-            #   It means the server wants to disconnect
-            #   -> Send confirm disconnection and break
-            if message == b'DISCONNECT':
-                log.info(f"Server has requested disconnection.")
-                self.disconnectEvent.set()
-                self.SendMessage(b'CONFIRM DISCONNECTION')
-                break
+            rxFilled += received
+            consumed = 0
+            while rxFilled - consumed >= HEADER_STRUCT.size:
+                message_length, reqID = HEADER_STRUCT.unpack_from(rxBuffer, consumed)
+                if message_length < HEADER_STRUCT.size or message_length > MAX_MESSAGE_LENGTH:
+                    # Malformed length field: the frame can never be consumed, close the connection
+                    log.error(f"Server sent a frame with invalid length {message_length}. Closing the connection")
+                    self.disconnectEvent.set()
+                    disconnected = True
+                    break
+
+                if rxFilled - consumed < message_length:
+                    # Only part of the message has arrived, wait for the next recv
+                    break
+
+                message = bytes(rxView[consumed + HEADER_STRUCT.size:consumed + message_length])
+                consumed += message_length
+                if LOG_INFO_ENABLED:
+                    log.info(f"Client has received message of length {message_length}")
+
+                # If the message is "DISCONNECT"
+                #   It means the server wants to disconnect
+                #   -> Send confirm disconnection and break
+                if message == b'DISCONNECT':
+                    log.info(f"Server has requested disconnection.")
+                    self.disconnectEvent.set()
+                    self.SendMessage(b'CONFIRM DISCONNECTION')
+                    disconnected = True
+                    break
 
-            # Any other messages:
-            self.replies[reqID] = message
-            log.info(f'Reply received: {reqID}, {message}. {self.replies}')
+                # Any other messages:
+                with self.replyCondition:
+                    self.replies[reqID] = message
+                    self.replyCondition.notify_all()
+                if LOG_INFO_ENABLED:
+                    log.info(f'Reply received: {reqID}, {message}. {self.replies}')
+
+            if consumed:
+                # Move any partial trailing message to the front of the buffer
+                remaining = rxFilled - consumed
+                if remaining:
+                    rxBuffer[:remaining] = rxBuffer[consumed:rxFilled]
+                rxFilled = remaining
 
         log.info(f"Listener thread has terminated")
 
@@ -10,6 +10,26 @@ from weather_forecast_gui import WeatherWindow
 
 PIC_PATH = os.path.join(Path(__file__).parent.absolute(),"pic")
 
+class RequestWorker(QtCore.QRunnable):
+    '''
+    Runs a blocking ClientProgram request on the global thread pool so the UI
+    thread stays responsive while waiting on the network.
+    The request's (state, data) result is reported through signals.finished,
+    delivered on the UI thread via a queued connection.
+    '''
+    class Signals(QtCore.QObject):
+        finished = QtCore.Signal(object, object)
+
+    def __init__(self, requestFunc, *args):
+        super().__init__()
+        self.requestFunc = requestFunc
+        self.args = args
+        self.signals = RequestWorker.Signals()
+
+    def run(self):
+        state, data = self.requestFunc(*self.args)
+        self.signals.finished.emit(state, data)
+
 class LoginWindow(object):
 
     def setupUI(self, MainWindow, clientProgram):
@@ -207,7 +227,16 @@ class LoginWindow(object):
     def onLogin(self, MainWindow, clientProgram:ClientProgram):
         username = self.username_box.text()
         password = self.password_box.text()
-        state, error = clientProgram.Login(username, password)
+
+        self.login_button.setEnabled(False)
+        worker = RequestWorker(clientProgram.Login, username, password)
+        worker.signals.finished.connect(
+            lambda state, error: self.onLoginDone(MainWindow, clientProgram, state, error),
+            QtCore.Qt.QueuedConnection)
+        QtCore.QThreadPool.globalInstance().start(worker)
+
+    def onLoginDone(self, MainWindow, clientProgram, state, error):
+        self.login_button.setEnabled(True)
 
         if state == ClientProgram.State.SUCCEEDED:
             QMessageBox.about(MainWindow, "", "Đăng nhập thành công")
@@ -253,7 +282,16 @@ class LoginWindow(object):
     def onRegister(self, MainWindow, clientProgram):
         username = self.username_box.text()
         password = self.password_box.text()
-        state, _ = clientProgram.Register(username, password)
+
+        self.signup_button_2.setEnabled(False)
+        worker = RequestWorker(clientProgram.Register, username, password)
+        worker.signals.finished.connect(
+            lambda state, _: self.onRegisterDone(MainWindow, state),
+            QtCore.Qt.QueuedConnection)
+        QtCore.QThreadPool.globalInstance().start(worker)
+
+    def onRegisterDone(self, MainWindow, state):
+        self.signup_button_2.setEnabled(True)
 
         if state == ClientProgram.State.SUCCEEDED:
             QMessageBox.about(MainWindow, "", "Đăng ký thành công")
@@ -2,19 +2,30 @@
 Console-based module for weather app server side functionality
 '''
 import threading
+import selectors
 import datetime
 import logging
 import socket
+import struct
+import select
 import queue
 import json
+import time
 import sys
 import os
 from pathlib import Path
 from enum import Enum
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 from weather_data_handler import WeatherDataHandler, WeatherDataModifier
 from user_data_handler import UserDataHandler
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 D_HOST = '0.0.0.0'
 D_PORT = 7878
 D_BACKLOG = 1
@@ -24,6 +35,18 @@ FORMAT = 'utf-8'
 HEADER_LENGTH = 8
 ID_LENGTH = 4
 
+# Precompiled codec for the [HEADER - 8 bytes][ID - 4 bytes] message prefix
+HEADER_STRUCT = struct.Struct('>QI')
+
+# Initial size of the per-connection receive buffer, grown if a message outsizes it
+RECV_BUFFER_SIZE = 65536
+
+# Upper bound on a single framed message; anything larger is a protocol violation
+MAX_MESSAGE_LENGTH = 16 * 1024 * 1024
+
+# sendmsg gathers the prefix and body into one kernel write without joining them first
+HAS_SENDMSG = hasattr(socket.socket, 'sendmsg')
+
 isbundled = getattr(sys, 'frozen', False) and hasattr(sys,'_MEIPASS')
 
 EXE_PATH = os.path.join(Path(__file__).parent.absolute() if not isbundled else os.path.dirname(sys.executable))
@@ -57,6 +80,21 @@ log.setLevel(logging.DEBUG)
 log.addHandler(f_handler)
 # log.addHandler(c_handler)
 
+# Evaluated once at import so per-message paths can skip building f-string log
+# records entirely when info logging is turned off above
+LOG_INFO_ENABLED = log.isEnabledFor(logging.INFO)
+
+
+def EncodeJson(obj):
+    '''
+    Serialize obj to UTF-8 encoded JSON bytes
+    Uses orjson when it is installed, which serializes several times faster
+    than the standard library and skips the separate str.encode pass
+    '''
+    if orjson:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode(FORMAT)
+
 
 #-------------------- Threaded decorator --------------------#
 def threaded(func) -> threading.Thread:
@@ -74,12 +112,73 @@ def threaded_daemon(func) -> threading.Thread:
     return wrapper
 
 
+class ReadWriteLock:
+    '''
+    A readers-writer lock for data that is read constantly but written rarely
+    Any number of readers may hold the lock together while a writer gets exclusive access
+    Writers are preferred, so a steady stream of readers cannot starve a pending write
+    Use the ForRead and ForWrite methods as context managers:
+        with lock.ForRead():
+            ...
+    '''
+
+    class _Guard:
+        def __init__(self, acquire, release):
+            self.acquire = acquire
+            self.release = release
+
+        def __enter__(self):
+            self.acquire()
+            return self
+
+        def __exit__(self, excType, excValue, traceback):
+            self.release()
+            return False
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writersWaiting = 0
+        self._writing = False
+
+    def AcquireRead(self):
+        with self._cond:
+            while self._writing or self._writersWaiting:
+                self._cond.wait()
+            self._readers += 1
+
+    def ReleaseRead(self):
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def AcquireWrite(self):
+        with self._cond:
+            self._writersWaiting += 1
+            while self._writing or self._readers:
+                self._cond.wait()
+            self._writersWaiting -= 1
+            self._writing = True
+
+    def ReleaseWrite(self):
+        with self._cond:
+            self._writing = False
+            self._cond.notify_all()
+
+    def ForRead(self):
+        return ReadWriteLock._Guard(self.AcquireRead, self.ReleaseRead)
+
+    def ForWrite(self):
+        return ReadWriteLock._Guard(self.AcquireWrite, self.ReleaseWrite)
+
+
 class MessagingHandler:
     '''
     Class for handling messages to a client and back via a socket.
     Its message takes the form of: [HEADER - 8 bytes][ID - 2 bytes] <Actual Message>
-    Messages are sent ad-hoc with SendMessage method while received messages are put to an external queue (see ListenForRequests method)
-    
+    Messages are sent ad-hoc with SendMessage method while received messages are put to an external queue (see HandleReadable method)
+
     Static Attributes:
         UniversalRequestQueue (queue.Queue):
             A common Queue for all objects of the class to put received messages, if configured to
@@ -87,17 +186,26 @@ class MessagingHandler:
         ServerDisconnectionEvent (threading.Event):
             A common Event for all objects of the class for additional control from the server program
             Set up an Event object prior to create any objects of this class.
+        Selector (selectors.BaseSelector):
+            A common selector all handlers' sockets are registered with
+            Set up a selector object prior to create any objects of this class.
     Attributes:
         id (int):
             an id for external identification purposes
         socket (socket.socket):
-            the communication socket, will be closed once the destructor is called
-        replyQueue (queue.Queue):
-            
+            the communication socket, non-blocking, registered with the class level Selector
+        rxBuffer (bytearray):
+            preallocated receive buffer the socket is read into directly with recv_into
+        rxFilled (int):
+            how many bytes of rxBuffer currently hold unconsumed data
+        sendLock (threading.Lock):
+            serializes writes to the socket, several pool workers may reply
+            to the same client at once
     '''
 
     UniversalRequestQueue = None
     ServerDisconnectionEvent = None
+    Selector = None
 
     @staticmethod
     def Reset():
@@ -107,6 +215,7 @@ class MessagingHandler:
         '''
         MessagingHandler.UniversalRequestQueue = None
         MessagingHandler.ServerDisconnectionEvent = None
+        MessagingHandler.Selector = None
 
     def __init__(self, id:int, clientSocket:socket.socket, addr):
         '''
@@ -126,14 +235,16 @@ class MessagingHandler:
         self.id = id
         self.socket = clientSocket
         self.address = addr
-        self.logged_in = False
+        self.rxBuffer = bytearray(RECV_BUFFER_SIZE)
+        self.rxView = memoryview(self.rxBuffer)
+        self.rxFilled = 0
+        self.sendLock = threading.Lock()
         log.info(f'New messaging handler with id {id} for {self.address}')
 
     def __del__(self):
         pass
 
     def SetLoggedIn(self, username):
-        self.logged_in = True
         self.username = username
 
     def SendMessage(self, message:bytes, id:int):
@@ -150,98 +261,136 @@ class MessagingHandler:
                 True if the message is sent without any server side or connection issues
                 False if any errors occured, and logs traceback in module level's log file
         '''
-        bytes_sent = 0
         length = 0
         try:
-            length = len(message) + HEADER_LENGTH + ID_LENGTH
-            assert length <= 0xFFFFFFFFFFFFFFFF
-            header = length.to_bytes(HEADER_LENGTH, byteorder='big')
-            reqID = id.to_bytes(ID_LENGTH, byteorder='big')
-            message = b''.join([header, reqID, message])
-        
-            bytes_sent = self.socket.send(message)
-            assert bytes_sent == length, "Length of message sent does not match that of the actual message"
-
-            log.info(f"Sent message of length {length} to client {self.id} at {self.address}")
+            length = len(message) + HEADER_STRUCT.size
+            prefix = HEADER_STRUCT.pack(length, id)
+            with self.sendLock:
+                sent = 0
+                if HAS_SENDMSG:
+                    try:
+                        sent = self.socket.sendmsg([prefix, message])
+                    except BlockingIOError:
+                        sent = 0
+                if sent < length:
+                    # The socket is non-blocking, so finish the frame by hand:
+                    # send what the kernel accepts and wait for writability on
+                    # the rest rather than abandoning a half-written frame
+                    pending = memoryview(prefix + message)
+                    while sent < length:
+                        try:
+                            sent += self.socket.send(pending[sent:])
+                        except BlockingIOError:
+                            select.select([], [self.socket], [], 0.5)
+
+            if LOG_INFO_ENABLED:
+                log.info(f"Sent message of length {length} to client {self.id} at {self.address}")
             return True
-        except AssertionError as e:
-            log.info(f"Couldn't send full message of length {length} to client {self.id} at {self.address}. Only {bytes_sent}")
         except Exception as e:
             log.exception(f"Counld not send message of length {length} to client {self.id} at {self.address}.")
 
         return False
     
-    @threaded
-    def ListenForRequests(self, requestQueue:queue.Queue=None):
+    def Unregister(self):
         '''
-        Threaded - Enable message listening mechanism for a handler
-        The method actively listens for requests
-        The method terminates if:
+        Remove this handler's socket from the class level Selector and close it
+        Safe to call more than once
+        '''
+        try:
+            MessagingHandler.Selector.unregister(self.socket)
+        except (KeyError, ValueError):
+            pass
+        try:
+            self.socket.close()
+        except OSError:
+            pass
+
+    def HandleReadable(self, sock:socket.socket):
+        '''
+        Callback invoked by the server's event loop whenever this handler's socket is readable
+        Reads whatever bytes are available, reassembles complete messages and puts them to the UniversalRequestQueue
+        The handler unregisters itself from the Selector if:
             - The connection is lost
             - The server wants to disconnect, this will only happens once the client confirms with a specific message
             - the client wants to disconnect (via a message), this will happens once a specific message is received, regardless of unsent replies
         Parameters:
-            requestQueue (queue.Queue):
-                The queue for requests to be put in for processing
-                Default is None.
-                If None, this object will use the class level UniversalRequestQueue to put in requests
+            sock (socket.socket):
+                the readable socket, as reported by the Selector
         '''
-        reqQueue = requestQueue if requestQueue else MessagingHandler.UniversalRequestQueue
-        log.info(f"Client {self.id} has started listening for requests")
-        while True:
-            message = None
-            reqID = None
-            try:
-                # Listens for HEADER message
-                header_of_message = self.socket.recv(HEADER_LENGTH, socket.MSG_PEEK)
-                if header_of_message:
-                    message_length = int.from_bytes(header_of_message, byteorder='big')
-                    if message_length:
-                        bytesReceived = 0
-                        chunks = []
-                        while bytesReceived < message_length:
-                            message = self.socket.recv(message_length - bytesReceived)
-                            bytesReceived += len(message)
-                            chunks.append(message)
-                        message = b''.join(chunks)
-                        # message is now b'<HEADER><ID><MESSAGE>'
-                        reqID = int.from_bytes(message[HEADER_LENGTH:HEADER_LENGTH + ID_LENGTH], byteorder='big')
-                        message = message[HEADER_LENGTH + ID_LENGTH:]
-                        log.info(f"Client handler {self.id} has received message of length {message_length}")
-            except ConnectionResetError as e:
-                # This thread should now close
-                reqQueue.put((self.id, id, b'DISCONNECT'))
-                log.info(f"Abrupt disconnection occured while listening for client {self.id}'s requests. The connection will effectively close")
-                break
-            except Exception as e:
-                # Please handle errors
-                log.exception(f"Exception occured on client {self.id}'s listening thread")
-
-            # Now that we have a request
-            if message:
-                # 1. If the request is "CONFIRM DISCONNECTION" AND server_disconnect Event is set
-                #   It means the server has previously sent a request to disconnect and client has confirm disconnection
-                #   -> Break
-                if MessagingHandler.ServerDisconnectionEvent.is_set() and message == b'CONFIRM DISCONNECTION':
-                    log.info(f"Client {self.id} at {self.address} has confirmed disconnection for server.")
-                    break
+        reqQueue = MessagingHandler.UniversalRequestQueue
+        if self.rxFilled == len(self.rxBuffer):
+            # A message outsizes the buffer, double it so receiving can progress
+            self.rxView.release()
+            self.rxBuffer.extend(bytes(len(self.rxBuffer)))
+            self.rxView = memoryview(self.rxBuffer)
+
+        received = 0
+        try:
+            received = sock.recv_into(self.rxView[self.rxFilled:])
+        except BlockingIOError:
+            # Spurious readiness, nothing to read yet
+            return
+        except (ConnectionResetError, OSError):
+            received = 0
+        except Exception as e:
+            log.exception(f"Exception occured while reading from client {self.id}")
+            received = 0
+
+        if not received:
+            # Connection lost or reset by peer
+            self.Unregister()
+            reqQueue.put((self.id, 0, b'DISCONNECT'))
+            log.info(f"Abrupt disconnection occured while listening for client {self.id}'s requests. The connection will effectively close")
+            return
 
-                # 2. If the request is "DISCONNECT"
-                #   It means the client wants to and will disconnect
-                #   -> Break, set client_disconnect Event
-                # Maybe?
-                elif message == b'DISCONNECT':
-                    log.info(f"Client {self.id} at {self.address} has queued for disconnection.")
-                    reqQueue.put((self.id, reqID, message))
-                    break
+        self.rxFilled += received
+        consumed = 0
+        while self.rxFilled - consumed >= HEADER_STRUCT.size:
+            message_length, reqID = HEADER_STRUCT.unpack_from(self.rxBuffer, consumed)
+            if message_length < HEADER_STRUCT.size or message_length > MAX_MESSAGE_LENGTH:
+                # Malformed length field: the frame can never be consumed, drop the connection
+                log.warning(f"Client {self.id} at {self.address} sent a frame with invalid length {message_length}. Dropping the connection")
+                self.Unregister()
+                reqQueue.put((self.id, 0, b'DISCONNECT'))
+                return
+
+            if self.rxFilled - consumed < message_length:
+                # Only part of the message has arrived, wait for the next readable event
+                break
 
-                # 3. Any other messages: Pass it down to UniversalRequestQueue
+            message = bytes(self.rxView[consumed + HEADER_STRUCT.size:consumed + message_length])
+            consumed += message_length
+            if LOG_INFO_ENABLED:
+                log.info(f"Client handler {self.id} has received message of length {message_length}")
+
+            # 1. If the request is "CONFIRM DISCONNECTION" AND server_disconnect Event is set
+            #   It means the server has previously sent a request to disconnect and client has confirm disconnection
+            #   -> Unregister
+            if MessagingHandler.ServerDisconnectionEvent.is_set() and message == b'CONFIRM DISCONNECTION':
+                log.info(f"Client {self.id} at {self.address} has confirmed disconnection for server.")
+                self.Unregister()
+                return
+
+            # 2. If the request is "DISCONNECT"
+            #   It means the client wants to and will disconnect
+            #   -> Unregister, the processing thread frees the slot
+            elif message == b'DISCONNECT':
+                log.info(f"Client {self.id} at {self.address} has queued for disconnection.")
                 reqQueue.put((self.id, reqID, message))
+                self.Unregister()
+                return
+
+            # 3. Any other messages: Pass it down to UniversalRequestQueue
+            reqQueue.put((self.id, reqID, message))
+            if LOG_INFO_ENABLED:
                 log.info(f"Client handler {self.id} has posted of length {message_length} to the process queue")
-                
-            # Go back to listening
 
-        log.info(f"Client {self.id} handler's listener thread for {self.address} has terminated")
+        if consumed:
+            # Move any partial trailing message to the front of the buffer
+            remaining = self.rxFilled - consumed
+            if remaining:
+                self.rxBuffer[:remaining] = self.rxBuffer[consumed:self.rxFilled]
+            self.rxFilled = remaining
 
 
 class ServerProgram:
@@ -254,11 +403,20 @@ class ServerProgram:
             indicates the number of client sockets a class' object can handle at once
         serverSocket (socket.socket):
             the socket object for the listening server
+        sel (selectors.BaseSelector):
+            the selector driving the single-threaded event loop for all sockets
         clients (list):
-            a list of tuples in form of (handlerThread, clientSocket, address). DO NOT access directly:
-            - handlerThread (threading.Thread): the thread handling a single client's requests
-            - clientSocket (socket.socket): the socket object for communicating a client
-            - address (str): address of the client connecting to the socket
+            a list of MessagingHandler slots, one per client, None while unoccupied.
+            DO NOT access directly
+        freeSlots (collections.deque):
+            ids of the unoccupied entries of clients, guarded by clientListLock
+        loggedInIds (set):
+            ids of the clients that have logged in, consulted on every WEATHER request
+        slotQueues (list):
+            one deque of pending (reqID, request) pairs per client slot, guarded by
+            clientListLock, so a client's requests are processed in arrival order
+        slotBusy (list):
+            per-slot flags marking whether a pool worker is draining that slot's queue
         weatherDataHandler:
             a WeatherDataHandler object, used to fetch weather data queries
         userdataHandler:
@@ -267,6 +425,12 @@ class ServerProgram:
             a WeatherDataModifier object, used for an admin to modify the weather data
         universalRequestQueue (queue.Queue):
             a request queue (id, request) for structured requests from clients
+        fetchAllCache (dict):
+            pre-encoded replies for WEATHER ALL keyed by date, guarded by weatherDatabaseLock
+            and invalidated when the weather database is reloaded after an edit
+        weatherDatabaseLock (ReadWriteLock):
+            lets WEATHER fetches from several clients proceed in parallel while a
+            database reload after an edit still gets exclusive access
         serverDisconnectionEvent (threading.Event):
             an event signals a top-level disconnection of all clients' channels
     '''
@@ -287,13 +451,22 @@ class ServerProgram:
         self.userDataHandler = UserDataHandler(USER_DATA_PATH)
         self.adminWeatherHandler = None
         self.universalRequestQueue = queue.Queue()
+        self.sel = selectors.DefaultSelector()
+        self.fetchAllCache = dict()
 
         self.clientListLock = threading.Lock()
-        self.weatherDatabaseLock = threading.Lock()
+        self.weatherDatabaseLock = ReadWriteLock()
         self.serverDisconnectionEvent = threading.Event()
 
         MessagingHandler.UniversalRequestQueue = self.universalRequestQueue
         MessagingHandler.ServerDisconnectionEvent = self.serverDisconnectionEvent
+        MessagingHandler.Selector = self.sel
+
+        self.commandHandlers = {
+            b'LOGIN': self.HandleLogin,
+            b'REGISTER': self.HandleRegister,
+            b'WEATHER': self.HandleWeather,
+        }
 
         log.info(f"Server program created.")
 
@@ -317,13 +490,11 @@ class ServerProgram:
 
         a = input("Terminate by any input: ")
         self.serverDisconnectionEvent.set()
-        self.serverSocket.close()
         log.info(f"Server has issued disconnection to all clients")
 
         for connection in self.clients:
-            if connection != (None, None):
-                connection[1].SendMessage(b'DISCONNECT', 0xFFFF)
-                connection[0].join()
+            if connection is not None:
+                connection.SendMessage(b'DISCONNECT', 0xFFFF)
 
         connectionThread.join()
         processthread.join()
@@ -345,7 +516,12 @@ class ServerProgram:
 
         self.serverDisconnectionEvent.clear()
         self.maxClients = num_clients
-        self.clients = [(None, None) for _ in range(self.maxClients)]
+        self.clients = [None for _ in range(self.maxClients)]
+        self.freeSlots = deque(range(self.maxClients))
+        self.loggedInIds = set()
+        self.slotQueues = [deque() for _ in range(self.maxClients)]
+        self.slotBusy = [False for _ in range(self.maxClients)]
+        self.pool = ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 4)))
         self.connectionThread = self.OpenServer(host, port, backlog)
         log.info(f"Opened new thread {self.connectionThread} to handle server's connection requests")
 
@@ -361,21 +537,21 @@ class ServerProgram:
             return
             
         self.serverDisconnectionEvent.set()
-        self.serverSocket.close()
-        self.serverSocket = None
         log.info(f"Server has issued disconnection to all clients")
 
         for connection in self.clients:
-            if connection != (None, None):
-                connection[1].SendMessage(b'DISCONNECT', 0xFFFF)
-                connection[0].join()
+            if connection is not None:
+                connection.SendMessage(b'DISCONNECT', 0xFFFF)
 
         if self.connectionThread:
             self.connectionThread.join()
         if self.processthread:
             self.processthread.join()
+        if self.pool:
+            self.pool.shutdown(wait=True)
         self.connectionThread = None
         self.processthread = None
+        self.pool = None
         log.info(f"All client handlers has terminated")
         self.started = False
 
@@ -408,8 +584,9 @@ class ServerProgram:
 
             self.adminWeatherHandler = None
             
-            with self.weatherDatabaseLock:
+            with self.weatherDatabaseLock.ForWrite():
                 self.weatherDataHandler.LoadDatabase()
+                self.fetchAllCache.clear()
 
             self.editing = False
 
@@ -424,80 +601,147 @@ class ServerProgram:
         '''
         return self.adminWeatherHandler and self.adminWeatherHandler.changed
         
+    def AcceptConnection(self, sock:socket.socket):
+        '''
+        Callback invoked by the event loop when the listening socket is readable
+        Accepts the pending connection and registers it with the selector if a client slot is free,
+        otherwise refuses it by closing the socket immediately
+        Parameters:
+            sock (socket.socket): the listening socket, as reported by the selector
+        '''
+        try:
+            clientSocket, address = sock.accept()
+        except OSError:
+            return
+
+        clientSocket.setblocking(False)
+        # Replies are small header+body frames; disable Nagle so they are not held
+        # back waiting for an ACK, and keep idle connections from silently dying
+        clientSocket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        clientSocket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        with self.clientListLock:
+            i = self.freeSlots.popleft() if self.freeSlots else None
+            if i is not None:
+                handler = MessagingHandler(i, clientSocket, address)
+                self.sel.register(clientSocket, selectors.EVENT_READ, data=handler.HandleReadable)
+                self.clients[i] = handler
+
+        if i is None:
+            clientSocket.close()
+            log.info(f"Refused connection from {address}. All {self.maxClients} client slots are taken")
+            return
+
+        log.info(f"{address} connected. Registered their socket with the event loop as client {i}")
+        log.info(f"Server program has opened {self.maxClients - len(self.freeSlots)} sockets. {len(self.freeSlots)} remaining")
+
     @threaded_daemon
     def OpenServer(self, host=D_HOST, port=D_PORT, backlog=D_BACKLOG):
         '''
         Threaded (daemon) - Open the server at (host, port) for backlog ammount of unaccepted connections
-        
+        Runs a selector-based event loop serving the listening socket and every client socket
+        from this single thread, instead of one blocked thread per client
+
         Parameters:
             host (str): host part
             port (int): port
             backlog (int): backlog number
         '''
         #Obligatory binding and listen
-
+        if not self.serverSocket:
+            self.serverSocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.serverSocket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.serverSocket.bind((host, port))
+        self.serverSocket.listen(backlog)
+        self.serverSocket.setblocking(False)
+        self.sel.register(self.serverSocket, selectors.EVENT_READ, data=self.AcceptConnection)
 
         log.info(f"Server socket opened at ({host}, {port}) for {self.maxClients} clients")
-        while True:
-            if self.serverDisconnectionEvent.is_set():
-                break
-
-            while self.clients.count((None, None)) > 0:
-                if not self.serverSocket:
-                    self.serverSocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    self.serverSocket.bind((host, port))
-                    self.serverSocket.listen(backlog)
-
-                try:
-                    clientSocket, address = self.serverSocket.accept()
-                except:
-                    break
-
-                with self.clientListLock:
-                    for i in range(len(self.clients)):
-                        if self.clients[i] == (None, None):
-                            handler = MessagingHandler(i, clientSocket, address)
-                            thread = handler.ListenForRequests()
-                            log.info(f"{address} connected. Opened new thread {thread} to listen to their requests")
-
-                            self.clients[i] = (thread, handler)
-                            break
-
-                log.info(f"Server program has opened {self.maxClients - self.clients.count((None, None))} sockets. {self.clients.count((None, None))} remaining")
-            
-            if self.serverSocket:
-                self.serverSocket.close()
-                self.serverSocket = None
+        while not self.serverDisconnectionEvent.is_set():
+            for key, _ in self.sel.select(timeout=0.5):
+                key.data(key.fileobj)
+
+        # Disconnection was issued: keep serving reads for a grace period so clients
+        # can confirm disconnection, then drop whatever is left
+        deadline = time.monotonic() + 5.0
+        while len(self.sel.get_map()) > 1 and time.monotonic() < deadline:
+            for key, _ in self.sel.select(timeout=0.5):
+                key.data(key.fileobj)
+
+        for key in list(self.sel.get_map().values()):
+            self.sel.unregister(key.fileobj)
+            key.fileobj.close()
+        self.serverSocket = None
 
-        # Wait how do we stop connections if accept() just... blocks?
         log.info(f"Server connection thread has terminated")
-        if self.serverSocket:
-            self.serverSocket.close()
-            self.serverSocket = None
 
     @threaded
     def ProcessRequestQueue(self):
         '''
         Threaded - Enable the universalRequestQueue to be processes
-        After a request in the queue is process, the reply will be sent back to the client immediately
+        Requests are dispatched to a bounded thread pool so independent clients are
+        served in parallel, but requests from the same client stay in a per-slot
+        queue drained by one pool worker at a time so they are processed in the
+        order they arrived
         '''
         while True:
-            while not self.universalRequestQueue.empty():
-                id, reqID, request = self.universalRequestQueue.get()
-                reply = self.ProcessRequest(id, request)
-                if reply and self.clients[id][0].is_alive():
-                    log.info(f"Letting client {id}'s handler replying to their client. Reply is {reply}")
-                    self.clients[id][1].SendMessage(reply, reqID)
-                elif not reply:
-                    self.clients[id] = (None, None)
-                    log.info(f"Removed client {id}'s handler from client list")
+            try:
+                id, reqID, request = self.universalRequestQueue.get(timeout=0.5)
+            except queue.Empty:
+                # Now that there are no more requests:
+                if self.serverDisconnectionEvent.is_set():
+                    break
+                continue
 
-            # Now that there are no more requests:
-            if self.serverDisconnectionEvent.is_set():
-                break
+            with self.clientListLock:
+                self.slotQueues[id].append((reqID, request))
+                if not self.slotBusy[id]:
+                    self.slotBusy[id] = True
+                    self.pool.submit(self.RunSlotQueue, id)
 
         log.info(f"Processing thread has terminated")
 
+    def RunSlotQueue(self, id:int):
+        '''
+        Drain client id's request queue on a pool worker, one request at a time.
+        At most one drainer runs per slot (tracked by slotBusy), which keeps a
+        client's pipelined requests in order without holding up other clients
+        Parameters:
+            id (int): id of the client, dictated by the program
+        '''
+        while True:
+            with self.clientListLock:
+                if not self.slotQueues[id]:
+                    self.slotBusy[id] = False
+                    return
+                reqID, request = self.slotQueues[id].popleft()
+            self.HandleOneRequest(id, reqID, request)
+
+    def HandleOneRequest(self, id:int, reqID:int, request:bytes):
+        '''
+        Process a single request from the universalRequestQueue and reply to its client
+        Runs on the processing thread pool
+        Parameters:
+            id (int): id of the client, dictated by the program
+            reqID (int): client-specific identifier of the request
+            request (bytes): the request, as read off the wire
+        '''
+        reply = self.ProcessRequest(id, request)
+        if reply:
+            with self.clientListLock:
+                connection = self.clients[id]
+            if connection is not None:
+                if LOG_INFO_ENABLED:
+                    log.info(f"Letting client {id}'s handler replying to their client. Reply is {reply}")
+                connection.SendMessage(reply, reqID)
+        else:
+            with self.clientListLock:
+                self.clients[id] = None
+                self.freeSlots.append(id)
+                self.loggedInIds.discard(id)
+                # Anything still queued belonged to the departed client
+                self.slotQueues[id].clear()
+            log.info(f"Removed client {id}'s handler from client list")
+
     def ProcessRequest(self, id:int, request:bytes):
         '''
         Determines appropriate actions for a request from client.
@@ -516,90 +760,143 @@ class ServerProgram:
         Raises:
             eh?
         '''
-        log.info(f"Now processing Client {id}'s request: {request}")
+        if LOG_INFO_ENABLED:
+            log.info(f"Now processing Client {id}'s request: {request}")
         status = b'INVALID'
         reply = None
         if request == b'DISCONNECT':
             with self.clientListLock:
-                self.clients[id][0].join()
+                if self.clients[id] is not None:
+                    self.clients[id].Unregister()
 
             return None
         else:
             cmd, param = ServerProgram.SplitOnce(request)
             if cmd and param:
-                if cmd == b'LOGIN':
-                    param = param.decode(FORMAT)
-                    username, password = ServerProgram.SplitOnce(param)
-                    
-                    loginstatus = self.userDataHandler.Verify(username, password)
-                    if loginstatus == UserDataHandler.LoginState.VALID:
-                        status = b'SUCCEEDED'
-                        self.clients[id][1].SetLoggedIn(username)
-                    else:
-                        status = b'FAILED'
-                        if loginstatus == UserDataHandler.LoginState.NO_USERNAME:
-                            reply = b'USERNAME NOT FOUND'
-                        elif loginstatus == UserDataHandler.LoginState.WRONG_PASSWORD:
-                            reply = b'WRONG PASSWORD'
-                elif cmd == b'REGISTER':
-                    param = param.decode(FORMAT)
-                    username, password = ServerProgram.SplitOnce(param)
-                    registerstatus = self.userDataHandler.Register(username, password)
-                    if registerstatus == UserDataHandler.RegisterState.VALID:
-                        status = b'SUCCEEDED'
-                    else:
-                        status = status = b'FAILED'
-                        if registerstatus == UserDataHandler.RegisterState.DUPLICATE:
-                            reply = b'USERNAME ALREADY EXISTS'
-                else:
-                    if self.clients[id][1].logged_in:
-                        if cmd == b'WEATHER':
-                            mode, param = ServerProgram.SplitOnce(param, errorOnNoTrail=False)
-                            if mode == b'ALL':
-                                date = None
-                                validDate = True
-                                if param:
-                                    try:
-                                        date = datetime.datetime.strptime(param.decode(FORMAT), '%Y/%m/%d').date()  
-                                    except Exception as e:
-                                        validDate = False
-                                        status = b'FAILED'
-                                        reply = b'WRONG DATE FORMAT'
-                                else:
-                                    date = datetime.date.today()
-
-                                if validDate:
-                                    alist = None
-                                    with self.weatherDatabaseLock:
-                                        alist = self.weatherDataHandler.FetchAllCitiesByDate(date)
-                                    reply = json.dumps(alist).encode(FORMAT)
-                                    status = b'SUCCEEDED'
-                                
-                            elif mode == b'RECENT':
-                                city_id, count = ServerProgram.SplitOnce(param, errorOnNoTrail=False)
-                                good_values = True
-                                try:
-                                    city_id = int(city_id.decode(FORMAT))
-                                    count = 7 if not count else int(count.decode(FORMAT))
-                                except:
-                                    status = b'FAILED'
-                                    reply = b'VALUE ERROR'
-                                    good_values = False
-
-                                if good_values:
-                                    fetchstate = False
-                                    res = None
-                                    with self.weatherDatabaseLock:
-                                        fetchstate, res = self.weatherDataHandler.FetchForcastsByCity(city_id, datetime.date.today(), count)
-                                    status = b'SUCCEEDED' if fetchstate else b'FAILED'
-                                    reply = json.dumps(res).encode(FORMAT) if fetchstate else b'NO CITYID'
-                    else:
-                        status = b'FAILED'
-                        reply = b'NOT LOGGED IN'
-
-        log.info(f"Done processing Client {id}'s request: {request}")
+                handler = self.commandHandlers.get(cmd)
+                if handler:
+                    status, reply = handler(id, param)
+
+        if LOG_INFO_ENABLED:
+            log.info(f"Done processing Client {id}'s request: {request}")
         return status + b' ' + reply if reply else status
 
+    def HandleLogin(self, id:int, param:bytes):
+        '''
+        Handle the LOGIN <username> <password> command for client id
+        Parameters:
+            id (int): id of the client, dictated by the program
+            param (bytes): everything after the command word
+        Returns:
+            (status, reply): status code and extra data (if any) for the client
+        '''
+        reply = None
+        # Split the raw bytes first so each field is decoded exactly once
+        username, password = ServerProgram.SplitOnce(param)
+        if username is not None:
+            username = username.decode(FORMAT)
+            password = password.decode(FORMAT)
+
+        loginstatus = self.userDataHandler.Verify(username, password)
+        if loginstatus == UserDataHandler.LoginState.VALID:
+            status = b'SUCCEEDED'
+            self.clients[id].SetLoggedIn(username)
+            self.loggedInIds.add(id)
+        else:
+            status = b'FAILED'
+            if loginstatus == UserDataHandler.LoginState.NO_USERNAME:
+                reply = b'USERNAME NOT FOUND'
+            elif loginstatus == UserDataHandler.LoginState.WRONG_PASSWORD:
+                reply = b'WRONG PASSWORD'
+
+        return status, reply
+
+    def HandleRegister(self, id:int, param:bytes):
+        '''
+        Handle the REGISTER <username> <password> command for client id
+        Parameters:
+            id (int): id of the client, dictated by the program
+            param (bytes): everything after the command word
+        Returns:
+            (status, reply): status code and extra data (if any) for the client
+        '''
+        reply = None
+        username, password = ServerProgram.SplitOnce(param)
+        if username is not None:
+            username = username.decode(FORMAT)
+            password = password.decode(FORMAT)
+        registerstatus = self.userDataHandler.Register(username, password)
+        if registerstatus == UserDataHandler.RegisterState.VALID:
+            status = b'SUCCEEDED'
+        else:
+            status = b'FAILED'
+            if registerstatus == UserDataHandler.RegisterState.DUPLICATE:
+                reply = b'USERNAME ALREADY EXISTS'
+
+        return status, reply
+
+    def HandleWeather(self, id:int, param:bytes):
+        '''
+        Handle the WEATHER ALL/RECENT commands for client id
+        Requires the client to be logged in
+        Parameters:
+            id (int): id of the client, dictated by the program
+            param (bytes): everything after the command word
+        Returns:
+            (status, reply): status code and extra data (if any) for the client
+        '''
+        if id not in self.loggedInIds:
+            return b'FAILED', b'NOT LOGGED IN'
+
+        status = b'INVALID'
+        reply = None
+        mode, param = ServerProgram.SplitOnce(param, errorOnNoTrail=False)
+        if mode == b'ALL':
+            date = None
+            validDate = True
+            if param:
+                try:
+                    date = datetime.datetime.strptime(param.decode(FORMAT), '%Y/%m/%d').date()
+                except Exception as e:
+                    validDate = False
+                    status = b'FAILED'
+                    reply = b'WRONG DATE FORMAT'
+            else:
+                date = datetime.date.today()
+
+            if validDate:
+                with self.weatherDatabaseLock.ForRead():
+                    reply = self.fetchAllCache.get(date)
+                    if reply is None:
+                        alist = self.weatherDataHandler.FetchAllCitiesByDate(date)
+                        reply = EncodeJson(alist)
+                        # Only cache dates the database actually has forecasts for,
+                        # or requests for arbitrary dates would grow the cache without bound
+                        if date in self.weatherDataHandler.date_rows:
+                            self.fetchAllCache[date] = reply
+                status = b'SUCCEEDED'
+
+        elif mode == b'RECENT':
+            city_id, count = ServerProgram.SplitOnce(param, errorOnNoTrail=False)
+            good_values = True
+            try:
+                city_id = int(city_id.decode(FORMAT))
+                count = 7 if not count else int(count.decode(FORMAT))
+            except:
+                status = b'FAILED'
+                reply = b'VALUE ERROR'
+                good_values = False
+
+            if good_values:
+                fetchstate = False
+                res = None
+                with self.weatherDatabaseLock.ForRead():
+                    fetchstate, res = self.weatherDataHandler.FetchForcastsByCity(city_id, datetime.date.today(), count)
+                status = b'SUCCEEDED' if fetchstate else b'FAILED'
+                reply = EncodeJson(res) if fetchstate else b'NO CITYID'
+
+        return status, reply
+
     @staticmethod
     def SplitOnce(request, errorOnNoTrail=True):
         '''
@@ -160,6 +160,9 @@ class WeatherDataHandler:
         self.datafilepath = jsonPath
         self.id_lookup = dict()
         self.city_list = []
+        self.city_ids = []
+        self.city_names = []
+        self.date_rows = dict()
 
     def LoadDatabase(self):
         '''
@@ -176,6 +179,11 @@ class WeatherDataHandler:
             fromjson = None
             i = 0
             if not os.path.isfile(self.datafilepath):
+                # No data file means an empty database; the columns and the
+                # date index still have to be rebuilt or a reload would keep
+                # serving rows from the previously loaded data
+                self.RebuildStaticColumns()
+                self.RebuildDateIndex()
                 return True
             with open(self.datafilepath, 'r') as fp:
                 fromjson = json.load(fp)
@@ -187,9 +195,57 @@ class WeatherDataHandler:
                 loaded = True
         except Exception as e:
             print(e)
-            
+
+        self.RebuildStaticColumns()
+        self.RebuildDateIndex()
         return loaded
 
+    def RebuildStaticColumns(self):
+        '''
+        Rebuild the per-city id and name columns from city_list
+        The columns hold the static part of every fetched weather row in
+        structure-of-arrays form so fetches can reuse them instead of
+        dereferencing each City object again on every call
+        '''
+        self.city_ids = [city.id for city in self.city_list]
+        self.city_names = [city.name for city in self.city_list]
+
+    def RebuildDateIndex(self):
+        '''
+        Rebuild the per-date index of assembled weather rows
+        Every date appearing in any city's forecasts gets its full row list built
+        once here, so FetchAllCitiesByDate is a dict lookup for known dates.
+        Rows for dates no city has a forecast of are built on each fetch and
+        never stored, keeping the index bounded by the database's own dates
+        '''
+        self.date_rows = dict()
+        alldates = set()
+        for city in self.city_list:
+            alldates.update(city.date_weather)
+        for adate in alldates:
+            self.date_rows[adate] = self.BuildRowsForDate(adate)
+
+    def BuildRowsForDate(self, adate:date):
+        '''
+        Assemble the list of weather rows of every city for a date
+        Parameters:
+            adate (datetime.date): the date to build rows of
+        Returns:
+            weatherdata (list):
+                A list of tuples in form of (city_id, city_name, weather, temperature, humidity, wind_speed)
+                If a forecast does not exists, relevant infos are replaced by None
+        '''
+        weatherList = []
+        city_ids = self.city_ids
+        city_names = self.city_names
+        for i, city in enumerate(self.city_list):
+            forecast = city.FetchForecast(adate)
+            if not forecast:
+                weatherList.append((city_ids[i], city_names[i], None, None, None, None))
+            else:
+                weatherList.append((city_ids[i], city_names[i]) + forecast.Info())
+        return weatherList
+
     def FetchAllCitiesByDate(self, adate:date=None):
         '''
         Retrive a list of essential weather data of every city in the database in primitives, if any is found
@@ -204,15 +260,13 @@ class WeatherDataHandler:
         try:
             if not adate:
                 adate = date.today()
-            weatherList = []
-            for city in self.city_list:
-                forecast = city.FetchForecast(adate)
-                if not forecast:
-                    weatherList.append((city.id, city.name, None, None, None, None))
-                else:
-                    t1, t2, t3, t4 = forecast.Info()
-                    weatherList.append((city.id, city.name, t1, t2, t3, t4))
-            return weatherList
+            rows = self.date_rows.get(adate)
+            if rows is None:
+                # Dates absent from the index have no forecasts; build the
+                # None-filled rows but do not store them, or a client asking
+                # for arbitrary dates could grow the index without bound
+                rows = self.BuildRowsForDate(adate)
+            return rows
         except Exception as e:
             print(e)
             return []
@@ -294,6 +348,8 @@ class WeatherDataModifier(WeatherDataHandler):
         else:
             self.city_list = []
             self.id_lookup = dict()
+            self.RebuildStaticColumns()
+            self.RebuildDateIndex()
             return False
     
     def SaveDatabase(self):
@@ -333,6 +389,9 @@ class WeatherDataModifier(WeatherDataHandler):
             new_city = City(city_name,self.IdGetter(city_name))
             self.city_list.append(new_city)
             self.id_lookup[new_city.id] = len(self.city_list) - 1
+            self.city_ids.append(new_city.id)
+            self.city_names.append(new_city.name)
+            self.date_rows.clear()
             self.changed = True
             return True, new_city.id
         except:
@@ -353,6 +412,7 @@ class WeatherDataModifier(WeatherDataHandler):
         try:
             city = self.city_list[self.id_lookup[cityid]]
             city.AddForecast(date, forecast, errorOnDuplicate=False, override=True)
+            self.date_rows.pop(date, None)
             self.changed = True
             return True
         except KeyError as e:
@@ -395,6 +455,7 @@ class WeatherDataModifier(WeatherDataHandler):
         try:
             city = self.city_list[self.id_lookup[cityid]]
             city.RemoveForecast(date)
+            self.date_rows.pop(date, None)
             self.changed = True
             return True
         except:
@@ -413,7 +474,10 @@ class WeatherDataModifier(WeatherDataHandler):
         try:
             cityindex = self.id_lookup[cityid]
             self.city_list.pop(cityindex)
-            
+            self.city_ids.pop(cityindex)
+            self.city_names.pop(cityindex)
+            self.date_rows.clear()
+
             # Fix id_lookup
             for i in range(cityindex, len(self.city_list)):
                 self.id_lookup[self.city_list[i].id] = i